@@ -4,12 +4,14 @@
 # intensity.py
 # definitions of intensity characters
 
-import collections
-
 import numpy as np
 import pandas as pd
+from scipy.sparse import csr_matrix
+from shapely.ops import unary_union
 from tqdm import tqdm  # progress bar
 
+from .weights import DistanceBand
+
 __all__ = [
     "AreaRatio",
     "Count",
@@ -21,6 +23,120 @@ __all__ = [
 ]
 
 
+def _neighbours_matrix(spatial_weights, ids):
+    """
+    Build sparse matrix linking each element to its neighbours and itself.
+
+    Rows and columns follow ``ids``. Neighbours keep the order given by
+    ``spatial_weights`` and the element itself comes last, so that sums computed
+    via matrix product match sums over ``neighbours + [index]``.
+    Elements not present in ``spatial_weights`` get an empty row.
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        binary matrix of shape (n, n)
+    np.array
+        boolean mask of elements present in ``spatial_weights``
+    """
+    ids = pd.Index(ids)
+    keys = set(spatial_weights.neighbors.keys())
+    present = np.zeros(len(ids), dtype=bool)
+    neighbours = []
+    lengths = np.zeros(len(ids), dtype=int)
+    for i, index in enumerate(ids):
+        if index in keys:
+            row = list(spatial_weights.neighbors[index]) + [index]
+            neighbours.extend(row)
+            lengths[i] = len(row)
+            present[i] = True
+
+    indices = ids.get_indexer(neighbours)
+    # drop neighbours which are not in ids
+    valid = indices >= 0
+    rows = np.repeat(np.arange(len(ids)), lengths)[valid]
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=len(ids)))])
+    matrix = csr_matrix(
+        (np.ones(valid.sum()), indices[valid], indptr), shape=(len(ids), len(ids))
+    )
+    return matrix, present
+
+
+def _neighbour_rows(spatial_weights, ids):
+    """
+    Yield positions of neighbours of each element of ``ids``, including itself.
+
+    Neighbours are fetched one element at a time. ``None`` is yielded for elements
+    not present in ``spatial_weights``.
+    """
+    ids = pd.Index(ids)
+    keys = set(spatial_weights.neighbors.keys())
+    for index in ids:
+        if index in keys:
+            positions = ids.get_indexer(
+                list(spatial_weights.neighbors[index]) + [index]
+            )
+            yield positions[positions >= 0]
+        else:
+            yield None
+
+
+def _neighbours_aggregate(spatial_weights, ids, values=None, codes=None):
+    """
+    Aggregate values over each element of ``ids`` and its neighbours.
+
+    :class:`momepy.DistanceBand` is read with :func:`_neighbour_rows` to keep its
+    neighbours on demand, other weights with :func:`_neighbours_matrix`.
+
+    Parameters
+    ----------
+    spatial_weights : libpysal.weights or momepy.DistanceBand
+        spatial weights matrix
+    ids : list, np.array, pd.Series
+        ids of elements used as ``spatial_weights`` index
+    values : np.array (default None)
+        array of shape (n,) or (n, k) to be summed
+    codes : np.array (default None)
+        non-negative integer codes of which unique values are counted
+
+    Returns
+    -------
+    np.array
+        sums of ``values`` (``None`` if ``values`` is ``None``)
+    np.array
+        counts of unique ``codes`` (``None`` if ``codes`` is ``None``)
+    np.array
+        boolean mask of elements present in ``spatial_weights``
+    """
+    sums = counts = None
+    if isinstance(spatial_weights, DistanceBand):
+        present = np.zeros(len(ids), dtype=bool)
+        if values is not None:
+            sums = np.zeros(values.shape, dtype=values.dtype)
+        if codes is not None:
+            counts = np.zeros(len(ids), dtype=int)
+        for i, neighbours in enumerate(_neighbour_rows(spatial_weights, ids)):
+            if neighbours is None:
+                continue
+            present[i] = True
+            if values is not None:
+                sums[i] = values[neighbours].sum(axis=0)
+            if codes is not None:
+                counts[i] = np.unique(codes[neighbours]).size
+    else:
+        matrix, present = _neighbours_matrix(spatial_weights, ids)
+        if values is not None:
+            sums = matrix @ values
+        if codes is not None:
+            # indicator matrix of elements (rows) with codes (columns)
+            indicator = csr_matrix(
+                (np.ones(len(codes)), (np.arange(len(codes)), codes)),
+                shape=(len(codes), codes.max() + 1 if len(codes) else 0),
+            )
+            counts = (matrix @ indicator).getnnz(axis=1)
+    return sums, counts, present
+
+
 class AreaRatio:
     """
     Calculate covered area ratio or floor area ratio of objects.
@@ -50,6 +166,9 @@ class AreaRatio:
         the name of the left dataframe column, ``np.array``, or ``pd.Series`` where is stored shared unique ID
     right_unique_id : str, list, np.array, pd.Series (default None)
         the name of the left dataframe column, ``np.array``, or ``pd.Series`` where is stored shared unique ID
+    dtype : data-type (default None)
+        if set, resulting values are cast to it (e.g. ``np.float32``) to reduce memory.
+        Only floating data-types are allowed.
 
     Attributes
     ----------
@@ -82,12 +201,13 @@ class AreaRatio:
         unique_id=None,
         left_unique_id=None,
         right_unique_id=None,
+        dtype=None,
     ):
         self.left = left
         self.right = right
 
-        left = left.copy()
-        right = right.copy()
+        if dtype is not None and not np.issubdtype(dtype, np.floating):
+            raise ValueError("Attribute 'dtype' needs to be a floating data-type.")
 
         if unique_id:
             left_unique_id = unique_id
@@ -101,26 +221,26 @@ class AreaRatio:
         self.left_unique_id = left_unique_id
         self.right_unique_id = right_unique_id
 
-        if not isinstance(left_areas, str):
-            left["mm_a"] = left_areas
-            left_areas = "mm_a"
-        self.left_areas = left[left_areas]
-        if not isinstance(right_areas, str):
-            right["mm_a"] = right_areas
-            right_areas = "mm_a"
-        self.right_areas = right[right_areas]
-
-        look_for = right[
-            [right_unique_id, right_areas]
-        ].copy()  # keeping only necessary columns
-        look_for.rename(index=str, columns={right_areas: "lf_area"}, inplace=True)
-        look_for = look_for.groupby(right_unique_id).sum().reset_index()
-        objects_merged = left[[left_unique_id, left_areas]].merge(
-            look_for, left_on=left_unique_id, right_on=right_unique_id, how="left"
-        )
-        objects_merged.index = left.index
+        # avoid copying whole GeoDataFrames, only areas are needed
+        if isinstance(left_areas, str):
+            left_areas = left[left_areas]
+        else:
+            left_areas = pd.Series(left_areas, index=left.index)
+        self.left_areas = left_areas
+        if isinstance(right_areas, str):
+            right_areas = right[right_areas]
+        else:
+            right_areas = pd.Series(right_areas, index=right.index)
+        self.right_areas = right_areas
 
-        self.series = objects_merged["lf_area"] / objects_merged[left_areas]
+        look_for = right_areas.groupby(right[right_unique_id]).sum()
+        covering = left[left_unique_id].map(look_for)
+
+        results = covering.to_numpy() / left_areas.to_numpy()
+        if dtype is not None:
+            results = results.astype(dtype, copy=False)
+
+        self.series = pd.Series(results, index=left.index)
 
 
 class Count:
@@ -150,6 +270,9 @@ class Count:
         name of the column where is stored unique ID of aggregation in right gdf
     weighted : bool (default False)
         if ``True``, count will be divided by the area or length
+    dtype : data-type (default None)
+        if set, resulting values are cast to it (e.g. ``np.int32`` or ``np.float32``)
+        to reduce memory. Only floating data-types are allowed if ``weighted=True``.
 
     Attributes
     ----------
@@ -171,27 +294,31 @@ class Count:
     >>> blocks_df['buildings_count'] = mm.Count(blocks_df, buildings_df, 'bID', 'bID', weighted=True).series
     """
 
-    def __init__(self, left, right, left_id, right_id, weighted=False):
+    def __init__(self, left, right, left_id, right_id, weighted=False, dtype=None):
         self.left = left
         self.right = right
         self.left_id = left[left_id]
         self.right_id = right[right_id]
         self.weighted = weighted
 
-        count = collections.Counter(right[right_id])
-        df = pd.DataFrame.from_dict(count, orient="index", columns=["mm_count"])
-        joined = left[[left_id, "geometry"]].join(df["mm_count"], on=left_id)
-        joined.loc[joined["mm_count"].isna(), "mm_count"] = 0
+        if weighted and dtype is not None and not np.issubdtype(dtype, np.floating):
+            raise ValueError("Attribute 'dtype' needs to be a floating data-type.")
+
+        count = right[right_id].value_counts()
+        counts = left[left_id].map(count).fillna(0).to_numpy()
 
         if weighted:
-            if left.geometry[0].type in ["Polygon", "MultiPolygon"]:
-                joined["mm_count"] = joined["mm_count"] / left.geometry.area
-            elif left.geometry[0].type in ["LineString", "MultiLineString"]:
-                joined["mm_count"] = joined["mm_count"] / left.geometry.length
+            if left.geometry.iloc[0].type in ["Polygon", "MultiPolygon"]:
+                counts = counts / left.geometry.area.to_numpy()
+            elif left.geometry.iloc[0].type in ["LineString", "MultiLineString"]:
+                counts = counts / left.geometry.length.to_numpy()
             else:
                 raise TypeError("Geometry type does not support weighting.")
 
-        self.series = joined["mm_count"]
+        if dtype is not None:
+            counts = counts.astype(dtype, copy=False)
+
+        self.series = pd.Series(counts, index=left.index)
 
 
 class Courtyards:
@@ -210,6 +337,8 @@ class Courtyards:
     spatial_weights : libpysal.weights, optional
         spatial weights matrix - If None, Queen contiguity matrix will be calculated
         based on objects. It is to denote adjacent buildings (note: based on integer index).
+    verbose : bool (default True)
+        if True, shows progress bars in loops and indication of steps
 
     Attributes
     ----------
@@ -228,10 +357,9 @@ class Courtyards:
     Calculating spatial weights...
     """
 
-    def __init__(self, gdf, block_id, spatial_weights=None):
+    def __init__(self, gdf, block_id, spatial_weights=None, verbose=True):
         self.gdf = gdf
 
-        results_list = []
         gdf = gdf.copy()
 
         if not isinstance(block_id, str):
@@ -241,37 +369,27 @@ class Courtyards:
         self.block_id = gdf[block_id]
         # if weights matrix is not passed, generate it from objects
         if spatial_weights is None:
-            print("Calculating spatial weights...")
+            if verbose:
+                print("Calculating spatial weights...")
             from libpysal.weights import Queen
 
             spatial_weights = Queen.from_dataframe(gdf, silence_warnings=True)
 
         self.sw = spatial_weights
-        # dict to store nr of courtyards for each uID
-        courtyards = {}
-        components = pd.Series(spatial_weights.component_labels, index=gdf.index)
-        for index in tqdm(gdf.index, total=gdf.shape[0]):
-            # if the id is already present in courtyards, continue (avoid repetition)
-            if index in courtyards:
-                continue
-            else:
-                comp = spatial_weights.component_labels[index]
-                to_join = components[components == comp].index
-                joined = gdf.loc[to_join]
-                dissolved = joined.geometry.buffer(
-                    0.01
-                ).unary_union  # buffer to avoid multipolygons where buildings touch by corners only
-                try:
-                    interiors = len(list(dissolved.interiors))
-                except (ValueError):
-                    print("Something unexpected happened.")
-                for b in to_join:
-                    courtyards[b] = interiors  # fill dict with values
-        # copy values from dict to gdf
-        for index, row in tqdm(gdf.iterrows(), total=gdf.shape[0]):
-            results_list.append(courtyards[index])
-
-        self.series = pd.Series(results_list, index=gdf.index)
+        # component labels are computed by libpysal using scipy's connected_components
+        labels = spatial_weights.component_labels
+        n_components = spatial_weights.n_components
+        # buffer to avoid multipolygons where buildings touch by corners only
+        buffered = np.asarray(gdf.geometry.buffer(0.01))
+        # sort by component to get each component as a contiguous slice
+        order = np.argsort(labels, kind="mergesort")
+        bounds = np.searchsorted(labels[order], np.arange(n_components + 1))
+        interiors = np.empty(n_components, dtype=int)
+        for comp in tqdm(range(n_components), disable=not verbose):
+            dissolved = unary_union(buffered[order[bounds[comp] : bounds[comp + 1]]])
+            interiors[comp] = len(dissolved.interiors)
+
+        self.series = pd.Series(interiors[labels], index=gdf.index)
 
 
 class BlocksCount:
@@ -290,7 +408,7 @@ class BlocksCount:
         GeoDataFrame containing morphological tessellation
     block_id : str, list, np.array, pd.Series
         the name of the objects dataframe column, ``np.array``, or ``pd.Series`` where is stored block ID.
-    spatial_weights : libpysal.weights
+    spatial_weights : libpysal.weights or momepy.DistanceBand
         spatial weights matrix
     unique_id : str
         name of the column with unique id used as ``spatial_weights`` index
@@ -325,38 +443,38 @@ class BlocksCount:
         self.id = gdf[unique_id]
         self.weighted = weighted
 
-        # define empty list for results
-        results_list = []
+        if not isinstance(weighted, bool):
+            raise ValueError("Attribute 'weighted' needs to be True or False.")
+
         data = gdf.copy()
         if not isinstance(block_id, str):
             data["mm_bid"] = block_id
             block_id = "mm_bid"
         self.block_id = data[block_id]
-        data = data.set_index(unique_id)
 
-        if weighted is True:
-            areas = data.geometry.area
+        codes, _ = pd.factorize(data[block_id])
+        if len(codes):
+            codes[codes == -1] = codes.max() + 1  # keep missing block ID as a value
+        areas = data.geometry.area.to_numpy()
 
-        for index in tqdm(data.index, total=data.shape[0]):
-            if index in spatial_weights.neighbors.keys():
-                neighbours = spatial_weights.neighbors[index].copy()
-                neighbours.append(index)
-
-                vicinity = data.loc[neighbours]
+        areas_sum, counts, present = _neighbours_aggregate(
+            spatial_weights,
+            data[unique_id],
+            values=areas if weighted else None,
+            codes=codes,
+        )
 
-                if weighted is True:
-                    results_list.append(
-                        vicinity[block_id].unique().shape[0]
-                        / sum(areas.loc[neighbours])
-                    )
-                elif weighted is False:
-                    results_list.append(vicinity[block_id].unique().shape[0])
-                else:
-                    raise ValueError("Attribute 'weighted' needs to be True or False.")
-            else:
-                results_list.append(np.nan)
+        if weighted:
+            results = np.full(len(data), np.nan)
+            results[present] = counts[present] / areas_sum[present]
+        elif present.all():
+            results = counts
+        else:
+            # elements missing in spatial_weights get NaN
+            results = np.full(len(data), np.nan)
+            results[present] = counts[present]
 
-        self.series = pd.Series(results_list, index=gdf.index)
+        self.series = pd.Series(results, index=gdf.index)
 
 
 class Reached:
@@ -383,7 +501,7 @@ class Reached:
     right_id : str, list, np.array, pd.Series (default None)
         the name of the right dataframe column, ``np.array``, or ``pd.Series`` where is
         stored ID of streets (segments or nodes).
-    spatial_weights : libpysal.weights (default None)
+    spatial_weights : libpysal.weights or momepy.DistanceBand (default None)
         spatial weights matrix
     mode : str (default 'count')
         mode of calculation. If ``'count'`` function will return the count of reached elements.
@@ -393,6 +511,8 @@ class Reached:
         of reached elements.
     values : str (default None)
         the name of the objects dataframe column with values used for calculations
+    verbose : bool (default True)
+        if True, shows progress bars in loops and indication of steps
 
     Attributes
     ----------
@@ -428,14 +548,19 @@ class Reached:
         spatial_weights=None,
         mode="count",
         values=None,
+        verbose=True,
     ):
         self.left = left
         self.right = right
         self.sw = spatial_weights
         self.mode = mode
 
-        # define empty list for results
-        results_list = []
+        if mode not in ["count", "sum", "mean", "std"]:
+            raise ValueError(
+                "Mode {} is not supported. Use 'count', 'sum', 'mean' or 'std'.".format(
+                    mode
+                )
+            )
 
         if not isinstance(right_id, str):
             right = right.copy()
@@ -447,51 +572,60 @@ class Reached:
             left["mm_lid"] = left_id
             left_id = "mm_lid"
         self.left_id = left[left_id]
+
         if mode == "count":
-            count = collections.Counter(right[right_id])
+            count = right[right_id].value_counts()
+            results = left[left_id].map(count).fillna(0).to_numpy(dtype=int)
+            if spatial_weights is not None:
+                reached, _, present = _neighbours_aggregate(
+                    spatial_weights, left.index, values=results
+                )
+                # elements missing in spatial_weights get NaN
+                if present.all():
+                    results = reached.astype(int)
+                else:
+                    results = reached.astype(float)
+                    results[~present] = np.nan
+        else:
+            # positions of right elements for each id, to avoid masking right per row
+            groups = right.groupby(right_id).indices
+            if values:
+                data = right[values].to_numpy()
+            else:
+                data = right.geometry.area.to_numpy()
+            results = np.empty(left.shape[0], dtype=float)
+            left_ids = left[left_id].to_numpy()
 
-        # iterating over rows one by one
-        for index, lid in tqdm(left[left_id].iteritems(), total=left.shape[0]):
             if spatial_weights is None:
-                ids = [lid]
+                rows = ([i] for i in range(left.shape[0]))
             else:
-                neighbours = list(spatial_weights.neighbors[index])
-                neighbours.append(index)
-                ids = left.iloc[neighbours][left_id]
-            if mode == "count":
-                counts = []
-                for nid in ids:
-                    counts.append(count[nid])
-                results_list.append(sum(counts))
-            elif mode == "sum":
-                if values:
-                    results_list.append(
-                        sum(right.loc[right[right_id].isin(ids)][values])
-                    )
-                else:
-                    results_list.append(
-                        sum(right.loc[right[right_id].isin(ids)].geometry.area)
-                    )
-            elif mode == "mean":
-                if values:
-                    results_list.append(
-                        np.nanmean(right.loc[right[right_id].isin(ids)][values])
-                    )
+                rows = _neighbour_rows(spatial_weights, left.index)
+
+            # iterating over rows one by one
+            for i, neighbours in enumerate(
+                tqdm(rows, total=left.shape[0], disable=not verbose)
+            ):
+                # elements missing in spatial_weights get NaN
+                if neighbours is None:
+                    results[i] = np.nan
+                    continue
+                ids = left_ids[neighbours]
+
+                positions = [groups[nid] for nid in ids if nid in groups]
+                if positions:
+                    # sorted unique positions keep the order of right
+                    subset = data[np.unique(np.concatenate(positions))]
                 else:
-                    results_list.append(
-                        np.nanmean(right.loc[right[right_id].isin(ids)].geometry.area)
-                    )
-            elif mode == "std":
-                if values:
-                    results_list.append(
-                        np.nanstd(right.loc[right[right_id].isin(ids)][values])
-                    )
-                else:
-                    results_list.append(
-                        np.nanstd(right.loc[right[right_id].isin(ids)].geometry.area)
-                    )
+                    subset = data[:0]
+
+                if mode == "sum":
+                    results[i] = sum(subset)
+                elif mode == "mean":
+                    results[i] = np.nanmean(subset)
+                elif mode == "std":
+                    results[i] = np.nanstd(subset)
 
-        self.series = pd.Series(results_list, index=left.index)
+        self.series = pd.Series(results, index=left.index)
 
 
 class NodeDensity:
@@ -509,7 +643,7 @@ class NodeDensity:
         GeoDataFrame containing nodes of street network
     right : GeoDataFrame
         GeoDataFrame containing edges of street network
-    spatial_weights : libpysal.weights
+    spatial_weights : libpysal.weights or momepy.DistanceBand
         spatial weights matrix capturing relationship between nodes
     weighted : bool (default False)
         if True density will take into account node degree as ``k-1``
@@ -519,6 +653,8 @@ class NodeDensity:
         name of the column of right gdf containing id of starting node
     node_end : str (default 'node_end')
         name of the column of right gdf containing id of ending node
+    verbose : bool (default True)
+        if True, shows progress bars in loops and indication of steps
 
     Attributes
     ----------
@@ -554,6 +690,7 @@ class NodeDensity:
         node_degree=None,
         node_start="node_start",
         node_end="node_end",
+        verbose=True,
     ):
         self.left = left
         self.right = right
@@ -563,33 +700,39 @@ class NodeDensity:
             self.node_degree = left[node_degree]
         self.node_start = right[node_start]
         self.node_end = right[node_end]
-        # define empty list for results
-        results_list = []
+        results = np.zeros(left.shape[0])
 
         lengths = right.geometry.length
+        if weighted:
+            degrees = left[node_degree].to_numpy()
 
         # iterating over rows one by one
-        for index in tqdm(left.index, total=left.shape[0]):
+        for i, neighbours in enumerate(
+            tqdm(
+                _neighbour_rows(spatial_weights, left.index),
+                total=left.shape[0],
+                disable=not verbose,
+            )
+        ):
+            # elements missing in spatial_weights get NaN
+            if neighbours is None:
+                results[i] = np.nan
+                continue
 
-            neighbours = list(spatial_weights.neighbors[index])
-            neighbours.append(index)
             if weighted:
-                neighbour_nodes = left.iloc[neighbours]
-                number_nodes = sum(neighbour_nodes[node_degree] - 1)
+                number_nodes = (degrees[neighbours] - 1).sum()
             else:
                 number_nodes = len(neighbours)
 
+            node_ids = left.index[neighbours]
             length = lengths.loc[
-                right["node_start"].isin(neighbours)
-                & right["node_end"].isin(neighbours)
+                right["node_start"].isin(node_ids) & right["node_end"].isin(node_ids)
             ].sum()
 
             if length > 0:
-                results_list.append(number_nodes / length)
-            else:
-                results_list.append(0)
+                results[i] = number_nodes / length
 
-        self.series = pd.Series(results_list, index=left.index)
+        self.series = pd.Series(results, index=left.index)
 
 
 class Density:
@@ -607,7 +750,7 @@ class Density:
         GeoDataFrame containing objects to analyse
     values : str, list, np.array, pd.Series
         the name of the dataframe column, ``np.array``, or ``pd.Series`` where is stored character value.
-    spatial_weights : libpysal.weight
+    spatial_weights : libpysal.weights or momepy.DistanceBand
         spatial weights matrix
     unique_id : str
         name of the column with unique id used as ``spatial_weights`` index
@@ -640,8 +783,6 @@ class Density:
         self.sw = spatial_weights
         self.id = gdf[unique_id]
 
-        # define empty list for results
-        results_list = []
         data = gdf.copy()
 
         if values is not None:
@@ -658,21 +799,13 @@ class Density:
             areas = "mm_a"
         self.areas = data[areas]
 
-        data = data.set_index(unique_id)
-        # iterating over rows one by one
-        for index in tqdm(data.index, total=data.shape[0]):
-            if index in spatial_weights.neighbors.keys():
-                neighbours = spatial_weights.neighbors[index].copy()
-                if neighbours:
-                    neighbours.append(index)
-                else:
-                    neighbours = index
-                subset = data.loc[neighbours]
-                values_list = subset[values]
-                areas_list = subset[areas]
-
-                results_list.append(np.sum(values_list) / np.sum(areas_list))
-            else:
-                results_list.append(np.nan)
+        # missing values are skipped in sums, as np.sum on Series does
+        sums, _, present = _neighbours_aggregate(
+            spatial_weights,
+            data[unique_id],
+            values=data[[values, areas]].fillna(0).to_numpy(dtype=float),
+        )
+        results = np.full(len(data), np.nan)
+        results[present] = sums[present, 0] / sums[present, 1]
 
-        self.series = pd.Series(results_list, index=gdf.index)
+        self.series = pd.Series(results, index=gdf.index)
@@ -69,12 +69,12 @@ def _generate_primal(G, gdf_network, fields):
     """
     G.graph["approach"] = "primal"
     key = 0
-    for index, row in gdf_network.iterrows():
-        first = row.geometry.coords[0]
-        last = row.geometry.coords[-1]
+    geom_column = fields.index(gdf_network._geometry_column_name)
+    for row in gdf_network[fields].itertuples(index=False, name=None):
+        first = row[geom_column].coords[0]
+        last = row[geom_column].coords[-1]
 
-        data = [row[f] for f in fields]
-        attributes = dict(zip(fields, data))
+        attributes = dict(zip(fields, row))
         G.add_edge(first, last, key=key, **attributes)
         key += 1
 
@@ -1,8 +1,10 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import geopandas as gpd
 import libpysal
 import numpy as np
+from scipy.spatial import cKDTree
 
 
 __all__ = ["DistanceBand", "sw_high"]
@@ -13,16 +15,21 @@ class DistanceBand:
     On demand distance-based spatial weights-like class.
 
     Mimic the behavior of ``libpysal.weights.DistanceBand`` but do not compute all
-    neighbors at once but only on demand. Only ``DistanceBand.neighbors[key]`` is
-    implemented. Once user asks for ``DistanceBand.neighbors[key]``, neighbors for
-    specified key will be computed using rtree. The algorithm is significantly
-    slower than ``libpysal.weights.DistanceBand`` but allows for large number of
-    neighbors which may cause memory issues in libpysal.
+    neighbors at once but only on demand. Only ``DistanceBand.neighbors[key]`` and
+    ``DistanceBand.cardinalities`` are implemented. Once user asks for
+    ``DistanceBand.neighbors[key]``, neighbors for specified key will be computed
+    using ``scipy.spatial.cKDTree`` (centroids) or rtree (other geometries).
+    The algorithm is significantly slower than ``libpysal.weights.DistanceBand``
+    but allows for large number of neighbors which may cause memory issues in libpysal.
 
     Use ``libpysal.weights.DistanceBand`` if possible. ``momepy.weights.DistanceBand``
     only when necessary. ``DistanceBand.neighbors[key]`` should yield same results as
     :class:`momepy.DistanceBand`.
 
+    Intensity characters (e.g. :class:`momepy.Density`) convert libpysal weights to
+    a sparse matrix at once, but fetch neighbors of ``DistanceBand`` one element at
+    a time, keeping memory low at the cost of speed.
+
     Parameters
     ----------
     gdf : GeoDataFrame or GeoSeries
@@ -31,7 +38,8 @@ class DistanceBand:
         distance band to be used as buffer
     centroid : bool (default True)
         use centroid of geometry (as in ``libpysal.weights.DistanceBand``).
-        If ``False``, works with the geometry as it is.
+        If ``False``, works with the geometry as it is. Point geometry is used
+        directly, so centroids can be computed once and reused for multiple thresholds.
     ids : str
         column to be used as geometry ids. If not set, integer position is used.
 
@@ -39,23 +47,70 @@ class DistanceBand:
     ----------
     neighbors[key] : list
         list of ids of neighboring features
+    cardinalities : dict
+        number of neighbors for each id, computed for all features at once
+        on first access
 
     """
 
     def __init__(self, gdf, threshold, centroid=True, ids=None):
+        # work on a separate GeoSeries to keep the original geometry untouched
         if centroid:
-            gdf.geometry = gdf.centroid
+            if (gdf.geom_type == "Point").all():
+                geoms = gdf.geometry
+            else:
+                geoms = gdf.centroid
+        else:
+            geoms = gdf.geometry
 
-        self.neighbors = _Neighbors(gdf, threshold, ids=ids)
+        if ids:
+            ids = gdf[ids]
+
+        self.centroid = centroid
+        self.neighbors = _Neighbors(geoms, threshold, ids=ids, centroid=centroid)
+
+    @property
+    def cardinalities(self):
+        if not hasattr(self, "_cardinalities"):
+            neighbors = self.neighbors
+            if self.centroid:
+                # count all points within threshold in a single query
+                counts = (
+                    neighbors.tree.query_ball_point(
+                        neighbors.coords, neighbors.threshold, return_length=True
+                    )
+                    - 1
+                )
+            else:
+                # match all buffers against geometries in a single spatial join
+                buffers = gpd.GeoDataFrame(
+                    geometry=neighbors.bufferred.reset_index(drop=True)
+                )
+                geoms = gpd.GeoDataFrame(
+                    geometry=neighbors.geoms.reset_index(drop=True)
+                )
+                joined = gpd.sjoin(buffers, geoms, how="inner", op="intersects")
+                # each geometry intersects its own buffer
+                counts = (
+                    joined.index.value_counts()
+                    .reindex(range(len(geoms)), fill_value=1)
+                    .to_numpy()
+                    - 1
+                )
+            self._cardinalities = dict(zip(neighbors.keys(), counts))
+        return self._cardinalities
 
     def fetch_items(self, key):
-        possible_matches_index = list(
-            self.sindex.intersection(self.bufferred[key].bounds)
-        )
-        possible_matches = self.geoms.iloc[possible_matches_index]
-        match = possible_matches.index[
-            possible_matches.intersects(self.bufferred[key])
-        ].to_list()
+        if self.centroid:
+            match = self.tree.query_ball_point(self.coords[key], self.threshold)
+        else:
+            possible_matches_index = list(
+                self.sindex.intersection(self.bufferred[key].bounds)
+            )
+            possible_matches = self.geoms.iloc[possible_matches_index]
+            match = possible_matches.index[
+                possible_matches.intersects(self.bufferred[key])
+            ].to_list()
         match.remove(key)
         return match
 
@@ -65,22 +120,29 @@ class _Neighbors(dict, DistanceBand):
     Helper class for DistanceBand.
     """
 
-    def __init__(self, geoms, buffer, ids):
+    def __init__(self, geoms, buffer, ids, centroid):
         self.geoms = geoms
-        self.sindex = geoms.sindex
-        self.bufferred = geoms.buffer(buffer)
-        if ids:
-            self.ids = np.array(geoms[ids])
+        self.threshold = buffer
+        self.centroid = centroid
+        if centroid:
+            # points are matched by exact distance using tree built once
+            self.coords = np.column_stack((geoms.x, geoms.y))
+            self.tree = cKDTree(self.coords)
         else:
-            self.ids = range(len(self.geoms))
-        if ids:
+            self.sindex = geoms.sindex
+            self.bufferred = geoms.buffer(buffer)
+        if ids is not None:
+            self.ids = np.array(ids)
             self.ids_bool = True
+            # map ids to integer positions once instead of scanning ids on each query
+            self.positions = dict(zip(self.ids, range(len(self.ids))))
         else:
+            self.ids = range(len(self.geoms))
             self.ids_bool = False
 
     def __missing__(self, key):
         if self.ids_bool:
-            int_id = np.where(self.ids == key)[0][0]
+            int_id = self.positions[key]
             integers = self.fetch_items(int_id)
             return list(self.ids[integers])
         else:
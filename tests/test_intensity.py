@@ -2,7 +2,7 @@ import geopandas as gpd
 import momepy as mm
 import numpy as np
 import pytest
-from libpysal.weights import Queen
+from libpysal.weights import Queen, W
 from pytest import approx
 
 
@@ -77,6 +77,25 @@ class TestIntensity:
         self.blocks["area"] = self.blocks.geometry.area
         car_block = mm.AreaRatio(self.blocks, self.df_buildings, "area", "area", "bID")
         assert car_block.series.mean() == 0.2761974319698012
+        car32 = mm.AreaRatio(
+            self.df_tessellation,
+            self.df_buildings,
+            "area",
+            "area",
+            "uID",
+            dtype=np.float32,
+        )
+        assert car32.series.dtype == np.float32
+        assert car32.series.to_numpy() == approx(car.to_numpy(), nan_ok=True)
+        with pytest.raises(ValueError):
+            mm.AreaRatio(
+                self.df_tessellation,
+                self.df_buildings,
+                "area",
+                "area",
+                "uID",
+                dtype=np.int32,
+            )
 
     def test_Count(self):
         eib = mm.Count(self.blocks, self.df_buildings, "bID", "bID").series
@@ -89,6 +108,11 @@ class TestIntensity:
         check_eib = [13, 14, 8, 26, 24, 17, 23, 19]
         check_weib = 0.00040170607189453996
         assert eib.tolist() == check_eib
+        eib32 = mm.Count(self.blocks, self.df_buildings, "bID", "bID", dtype=np.int32)
+        assert eib32.series.dtype == np.int32
+        assert eib32.series.tolist() == check_eib
+        with pytest.raises(ValueError):
+            mm.Count(self.blocks, self.df_buildings, "bID", "bID", True, dtype=np.int32)
         assert weib.mean() == check_weib
         assert weis.mean() == 0.020524232642849215
 
@@ -116,6 +140,7 @@ class TestIntensity:
         assert count.mean() == check
         assert count2.mean() == check
         assert unweigthed.mean() == check2
+        assert unweigthed.dtype == int
         with pytest.raises(ValueError):
             count = mm.BlocksCount(
                 self.df_tessellation, "bID", sw, "uID", weighted="yes"
@@ -126,6 +151,19 @@ class TestIntensity:
             .series.isna()
             .any()
         )
+        empty = self.df_tessellation.iloc[:0]
+        assert mm.BlocksCount(empty, "bID", sw, "uID").series.empty
+
+        db = mm.DistanceBand(self.df_tessellation, 100, ids="uID")
+        sw_db = W({k: db.neighbors[k] for k in db.neighbors.keys()})
+        for weighted in [True, False]:
+            count_db = mm.BlocksCount(
+                self.df_tessellation, "bID", db, "uID", weighted=weighted
+            ).series
+            count_w = mm.BlocksCount(
+                self.df_tessellation, "bID", sw_db, "uID", weighted=weighted
+            ).series
+            assert count_db.to_numpy() == approx(count_w.to_numpy())
 
     def test_Reached(self):
         count = mm.Reached(self.df_streets, self.df_buildings, "nID", "nID").series
@@ -179,6 +217,19 @@ class TestIntensity:
         assert max(mean_v) == 7916.931385861784
         assert max(std_v) == 8995.18003493457
 
+        # elements missing in spatial_weights get NaN
+        sw_drop = mm.sw_high(k=2, gdf=self.df_streets)
+        del sw_drop.neighbors[0]
+        count_drop = mm.Reached(
+            self.df_streets, self.df_buildings, "nID", "nID", sw_drop
+        ).series
+        mean_drop = mm.Reached(
+            self.df_streets, self.df_buildings, "nID", "nID", sw_drop, mode="mean"
+        ).series
+        assert np.isnan(count_drop[0])
+        assert np.isnan(mean_drop[0])
+        assert (count_drop[1:] == count_sw[1:]).all()
+
     def test_NodeDensity(self):
         nx = mm.gdf_to_nx(self.df_streets)
         nx = mm.node_degree(nx)
@@ -193,6 +244,12 @@ class TestIntensity:
         assert weighted.mean() == 0.023207675994368446
         assert array.mean() == 0.008554067995928158
 
+        sw_drop = mm.sw_high(k=3, weights=W)
+        del sw_drop.neighbors[0]
+        dropped = mm.NodeDensity(nodes, edges, sw_drop).series
+        assert np.isnan(dropped[0])
+        assert (dropped[1:] == density[1:]).all()
+
     def test_Density(self):
         sw = mm.sw_high(k=3, gdf=self.df_tessellation, ids="uID")
         dens = mm.Density(
@@ -227,3 +284,23 @@ class TestIntensity:
             self.df_tessellation.area,
         ).series
         assert dens3.mean() == approx(1.656420)
+
+        # missing values are skipped
+        fl_area = self.df_buildings["fl_area"].copy()
+        fl_area.iloc[0] = np.nan
+        dens_nan = mm.Density(self.df_tessellation, fl_area, sw, "uID").series
+        fl_area.iloc[0] = 0
+        dens_zero = mm.Density(self.df_tessellation, fl_area, sw, "uID").series
+        assert not dens_nan.isna().any()
+        assert dens_nan.equals(dens_zero)
+
+        # DistanceBand neighbours are fetched per element with the same result
+        db = mm.DistanceBand(self.df_tessellation, 100, ids="uID")
+        sw_db = W({k: db.neighbors[k] for k in db.neighbors.keys()})
+        dens_db = mm.Density(
+            self.df_tessellation, self.df_buildings["fl_area"], db, "uID"
+        )
+        dens_w = mm.Density(
+            self.df_tessellation, self.df_buildings["fl_area"], sw_db, "uID"
+        )
+        assert dens_db.series.to_numpy() == approx(dens_w.series.to_numpy())
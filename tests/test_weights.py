@@ -43,7 +43,43 @@ class TestWeights:
             assert k in db_ids.neighbors.keys()
             assert sorted(lp_ids.neighbors[k]) == sorted(db_ids.neighbors[k])
 
-        db_cent_false = mm.DistanceBand(self.df_buildings, 100, centroid=False)
+        # input geometry is not replaced by centroids
+        assert (self.df_buildings.geom_type != "Point").all()
+
+        db_poly = mm.DistanceBand(self.df_buildings, 100, centroid=False)
+        assert sorted(db_poly.neighbors[0]) == [
+            111,
+            112,
+            113,
+            114,
+            115,
+            120,
+            121,
+            125,
+            130,
+            133,
+            134,
+        ]
+
+        db_cent_false = mm.DistanceBand(self.df_buildings.centroid, 100, centroid=False)
         assert sorted(db_cent_false.neighbors[0]) == sorted(
             [125, 133, 114, 134, 113, 121]
         )
+
+        assert db.cardinalities == lp.cardinalities
+        for k in range(len(self.df_buildings)):
+            assert k not in db.neighbors[k]
+            assert len(db.neighbors[k]) == db.cardinalities[k]
+        assert db_ids.cardinalities == lp_ids.cardinalities
+        assert db_cent_false.cardinalities[0] == 6
+        for k in range(len(self.df_buildings)):
+            assert db_poly.cardinalities[k] == len(db_poly.neighbors[k])
+
+        centroids = self.df_buildings.centroid
+        for threshold in [50, 100]:
+            lp = libpysal.weights.DistanceBand.from_dataframe(
+                self.df_buildings, threshold
+            )
+            assert (
+                mm.DistanceBand(centroids, threshold).cardinalities == lp.cardinalities
+            )